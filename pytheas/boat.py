@@ -1,10 +1,42 @@
-import geopy.distance as gp
 import math
 import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Dict, List, Tuple
 
-import pytheas.utilities
+from pytheas.kernels import NUMBA_AVAILABLE, _bearing, _destination, _polar_lookup
+from pytheas.utilities import (angle_uncertainty,
+                                difference_between_geographic_angles, geographic_angle_to_xy,
+                                polar_diagrams_to_table, si_to_knots)
+
+# displacement (sum of absolute lat/lon differences, in degrees) below which the bearing to the target is not recomputed
+BEARING_TOLERANCE = 1e-3
+
+# polar tables of the known crafts, shared by all their boats and indexed by the integer id of the craft. A craft is identified
+# by its name together with its polar table, since the same boat can be sailed with different crews and loads
+CRAFT_IDS: Dict[Tuple[str, bytes], int] = {}
+CRAFT_POLAR_TABLES: List[np.ndarray] = []
+_CRAFT_POLAR_LISTS: List[list] = []
+
+
+def register_craft(craft: str, speed_polar_diagram: pd.DataFrame, leeway_polar_diagram: pd.DataFrame) -> int:
+    """Registers the polar diagrams of a craft, so that all boats of that craft with the same polar diagrams share a single polar table.
+
+    Args:
+        craft (str): type of boat (e.g. "Hjortspring")
+        speed_polar_diagram (pd.DataFrame): table representing the boat speed polar diagram
+        leeway_polar_diagram (pd.DataFrame): table representing the boat leeway polar diagram
+
+    Returns:
+        int: id of the craft, indexing CRAFT_POLAR_TABLES. A craft registered again with different polar diagrams gets a new id.
+    """
+    polar_table = polar_diagrams_to_table(speed_polar_diagram, leeway_polar_diagram)
+    key = (craft, polar_table.tobytes())
+    if key not in CRAFT_IDS:
+        CRAFT_IDS[key] = len(CRAFT_POLAR_TABLES)
+        CRAFT_POLAR_TABLES.append(polar_table)
+        _CRAFT_POLAR_LISTS.append(polar_table.tolist())
+
+    return CRAFT_IDS[key]
 
 class Boat:
     """
@@ -14,74 +46,129 @@ class Boat:
     
     """
     
+    __slots__ = ('craft', 'craft_id', 'latitude', 'longitude', 'target', 'uncertainty_sigma',
+                 'speed_polar_diagram', 'leeway_polar_diagram', '_polar_table',
+                 '_trajectory', '_trajectory_length', 'bearing', '_last_bearing_position', '_target_trigonometry')
+    
     def __init__(self, craft: str, 
                  latitude: float, longitude: float, 
                  target: Tuple[float, float], 
                  uncertainty_sigma: float = 0.0,
                  speed_polar_diagram: pd.DataFrame = None, 
-                 leeway_polar_diagram: pd.DataFrame = None):
+                 leeway_polar_diagram: pd.DataFrame = None,
+                 max_steps: int = 1000):
         """Creates a new boat.
 
         Args:
             craft (str): type of boat (e.g. "Hjortspring")
             longitude (float): current longitude of the boat. It gets updated when running move_step().
             latitude (float): current latitude of the boat. It gets updated when running move_step().
-            target (Tuple[float, float]): tuple of lon/lat of the target.
+            target (Tuple[float, float]): tuple of lat/lon of the target.
             speed_polar_diagram (pd.DataFrame): table representing the boat speed polar diagram. Defaults to None.
             leeway_polar_diagram (pd.DataFrame): table representing the boat leeway polar diagram. Defaults to None.
+            max_steps (int, optional): number of steps for which the trajectory is preallocated. It grows if exceeded. Defaults to 1000.
         """
         self.craft = craft
+        self.craft_id = None
         self.latitude = latitude
         self.longitude = longitude
         self.target = target
         self.uncertainty_sigma = uncertainty_sigma
         self.speed_polar_diagram = speed_polar_diagram
         self.leeway_polar_diagram = leeway_polar_diagram
+        if speed_polar_diagram is not None and leeway_polar_diagram is not None:
+            # (speed in m/s, leeway) for every cell of the polar diagrams, shared with the other boats of the craft. The compiled
+            # lookup reads the array directly, while nested lists are faster to index from plain Python
+            self.craft_id = register_craft(craft, speed_polar_diagram, leeway_polar_diagram)
+            self._polar_table = CRAFT_POLAR_TABLES[self.craft_id] if NUMBA_AVAILABLE else _CRAFT_POLAR_LISTS[self.craft_id]
         
-        self.trajectory = [(latitude, longitude)]
-        self.bearing = pytheas.utilities.bearing_from_latlon([self.latitude, self.longitude], self.target)
+        self._trajectory = np.empty((max_steps + 1, 2))
+        self._trajectory[0] = (latitude, longitude)
+        self._trajectory_length = 1
+        self._last_bearing_position = None
+        self._update_bearing()
     
     
-    def speed_due_to_wind(self, current_winds: np.ndarray, bearing: float):
-        """Calculates the combined speed of paddling with the effect of the wind according to a polar diagram, when existing.
+    @property
+    def trajectory(self) -> np.ndarray:
+        """Positions (lat/lon) of the boat since its creation, as a view on the trajectory buffer."""
+        return self._trajectory[:self._trajectory_length]
+    
+    
+    def reserve_trajectory(self, n_steps: int):
+        """Makes room in the trajectory buffer for at least n_steps more positions, so that it does not grow while moving.
 
         Args:
-            current_winds (np.ndarray): Wind velocity (two components)
-            bearing_xy (np.ndarray): bearing of the boat split in x, y components
+            n_steps (int): number of steps that the boat is expected to move
+        """
+        required_length = self._trajectory_length + n_steps
+        if required_length > len(self._trajectory):
+            self._trajectory = np.resize(self._trajectory, (required_length, 2))
+    
+    
+    def _update_bearing(self):
+        """Calculates the bearing from the current position to the target, reusing the trigonometry of the target while it does not change.
+        """
+        target = tuple(self.target)
+        if self._last_bearing_position is None or target != self._last_bearing_position[2]:
+            target_latitude = math.radians(target[0])
+            self._target_trigonometry = (math.sin(target_latitude), math.cos(target_latitude), target[1])
+        
+        self.bearing = math.degrees(_bearing(self.latitude, self.longitude, *self._target_trigonometry)) % 360
+        self._last_bearing_position = (self.latitude, self.longitude, target)
+    
+    
+    def _wind_effects(self, current_winds: np.ndarray, bearing: float) -> Tuple[float, float]:
+        """Calculates both the speed and the leeway due to wind according to the polar diagrams, sharing the work between the two.
+
+        Args:
+            current_winds (np.ndarray): Wind velocity (speed and geographic angle)
+            bearing (float): bearing of the boat
 
         Raises:
             ValueError: Raised if the angle between the bearing and reference is a non-positive number
-            ValueError: Raised if the speed of the wind is higher than 30
+            ValueError: Raised if the speed of the wind is negative or NaN
             
         Returns:
-            speed (float): speed in m/s of the paddling crew
+            Tuple[float, float]: speed in m/s of the paddling crew and leeway angle in degrees
         """
 
         # find angle of wind compared to bearing of boat. 
-        effective_wind_angle = pytheas.utilities.difference_between_geographic_angles(bearing, current_winds[1])
-        # wind_sign = np.sign(effective_wind_angle)
+        effective_wind_angle = difference_between_geographic_angles(bearing, current_winds[1])
+        wind_sign = 1.0 if effective_wind_angle > 0 else (-1.0 if effective_wind_angle < 0 else 0.0)
 
         # then adapt to the polar diagram (symmetric, only reported for positive angles, with negative angles having opposite sign results)
-        abs_wind_angle = np.abs(effective_wind_angle)
+        abs_wind_angle = abs(effective_wind_angle)
 
         wind_speed = current_winds[0] # np.linalg.norm(current_winds)
-        wind_speed_knots = pytheas.utilities.si_to_knots(wind_speed)
+        wind_speed_knots = si_to_knots(wind_speed)
 
-        # round angle to next 10 and speed to next 5
-        if 0 <= abs_wind_angle <= 180:
-            rounded_angle = math.ceil(abs_wind_angle/10)*10
-        else:
+        if not 0 <= abs_wind_angle <= 180:
             raise ValueError(f"Absolute wind angle is not between 0 and 180 ({abs_wind_angle} deg)")
-        if 0 <= wind_speed_knots <= 30:
-            rounded_speed = math.ceil(wind_speed_knots/5)*5
-        elif wind_speed_knots > 30:
-            # OPEN what if speed is too high? Set final speed of boat to zero, possibly
-            rounded_speed = 30
-        else:
-            raise ValueError(f"Wind speed is negative ({wind_speed} m/s)")
+        # written so that a NaN wind speed is rejected too, as the polar lookup would clamp it to the 0 knots column
+        if not wind_speed_knots >= 0:
+            raise ValueError(f"Wind speed is negative or missing ({wind_speed} m/s)")
+
+        # interpolate bilinearly between the rows (every 10 deg) and columns (every 5 knots) of the polar tables
+        # OPEN what if speed is too high? For now it is capped at 30 knots, possibly set final speed of boat to zero
+        speed, leeway = _polar_lookup(abs_wind_angle / 10, float(wind_speed_knots), self._polar_table)
 
-        speed_in_knots = self.speed_polar_diagram[str(rounded_speed)][rounded_angle]
-        speed = pytheas.utilities.knots_to_si(speed_in_knots)
+        leeway_angle = wind_sign*leeway
+
+        return speed, leeway_angle
+    
+    
+    def speed_due_to_wind(self, current_winds: np.ndarray, bearing: float):
+        """Calculates the combined speed of paddling with the effect of the wind according to a polar diagram, when existing.
+
+        Args:
+            current_winds (np.ndarray): Wind velocity (speed and geographic angle)
+            bearing (float): bearing of the boat
+            
+        Returns:
+            speed (float): speed in m/s of the paddling crew
+        """
+        speed, _ = self._wind_effects(current_winds, bearing)
 
         return speed
     
@@ -90,42 +177,14 @@ class Boat:
         """Calculates the leeway due to wind according to a polar diagram, when existing.
 
         Args:
-            current_winds (np.ndarray): Wind velocity (two components)
-            bearing_xy (np.ndarray): bearing of the boat split in x, y components
-
-        Raises:
-            ValueError: Raised if the angle between the bearing and reference is a non-positive number
-            ValueError: Raised if the speed of the wind is higher than 30
+            current_winds (np.ndarray): Wind velocity (speed and geographic angle)
+            bearing (float): bearing of the boat
             
         Returns:
             leeway_angle: geographic angle of leeway due to the wind to be added to the bearing to obtain the real angle
                             at which the boat travels, in degrees
         """
-
-        # find angle of wind compared to bearing of boat. 
-        effective_wind_angle = pytheas.utilities.difference_between_geographic_angles(bearing, current_winds[1])
-        wind_sign = np.sign(effective_wind_angle)
-
-        # then adapt to the polar diagram (symmetric, only reported for positive angles, with negative angles having opposite sign results)
-        abs_wind_angle = np.abs(effective_wind_angle)
-
-        wind_speed = current_winds[0] # np.linalg.norm(current_winds)
-        wind_speed_knots = pytheas.utilities.si_to_knots(wind_speed)
-
-        # round angle to next 10 and speed to next 5
-        if 0 <= abs_wind_angle <= 180:
-            rounded_angle = math.ceil(abs_wind_angle/10)*10
-        else:
-            raise ValueError(f"Absolute wind angle is not between 0 and 180 ({abs_wind_angle} deg)")
-        if 0 <= wind_speed_knots <= 30:
-            rounded_speed = math.ceil(wind_speed_knots/5)*5
-        elif wind_speed_knots > 30:
-            # OPEN what if speed is too high? Set final speed of boat to zero, possibly
-            rounded_speed = 30
-        else:
-            raise ValueError(f"Wind speed is negative ({wind_speed} m/s)")
-
-        leeway_angle = wind_sign*self.leeway_polar_diagram[str(rounded_speed)][rounded_angle]
+        _, leeway_angle = self._wind_effects(current_winds, bearing)
 
         return leeway_angle
     
@@ -144,17 +203,13 @@ class Boat:
         """
         # TODO write displacement function for a boat with polar diagram, given winds and currents
         
-        paddling_speed = self.speed_due_to_wind(local_winds, bearing)
-        print(paddling_speed)
-        leeway_angle = self.leeway_due_to_wind(local_winds, bearing)
+        paddling_speed, leeway_angle = self._wind_effects(local_winds, bearing)
         effective_direction = bearing - leeway_angle
-        movement_angle_dxy = pytheas.utilities.geographic_angle_to_xy(effective_direction)
+        movement_angle_dxy = geographic_angle_to_xy(effective_direction)
         
-        # paddling_speed is in m/s, timestep is in minutes
-        timestep_seconds = timestep * 60.
-        wind_dxy = paddling_speed*movement_angle_dxy*timestep_seconds # wind_dxy in meters
-        currents_dxy = local_currents*timestep_seconds
-        displacement_dxy = (wind_dxy + currents_dxy) / 1000
+        # paddling_speed and currents are in m/s, timestep is in minutes, the constant factors are folded into one scalar
+        speed_to_km = timestep * 60. / 1000
+        displacement_dxy = (paddling_speed*movement_angle_dxy + local_currents) * speed_to_km
         
         return displacement_dxy
     
@@ -173,22 +228,30 @@ class Boat:
             local_currents (np.ndarray): array containing Northward and Eastward components of sea currents speed.
             uncertainty_sigma (float, optional): uncertainty of bearing due to navigational error. Defaults to 0.0.
         """
-        # first, update the bearing based on the local position
-        self.bearing = pytheas.utilities.bearing_from_latlon([self.latitude, self.longitude], self.target)
+        # first, update the bearing based on the local position, unless the boat is still close to where it was last calculated
+        last_latitude, last_longitude, last_target = self._last_bearing_position
+        if (abs(self.latitude - last_latitude) + abs(self.longitude - last_longitude) >= BEARING_TOLERANCE
+                or tuple(self.target) != last_target):
+            self._update_bearing()
         
         # next, add uncertainty to the bearing and split the bearing into x and y
-        bearing_with_uncertainty = self.bearing + pytheas.utilities.angle_uncertainty(self.uncertainty_sigma)
+        bearing_with_uncertainty = self.bearing + angle_uncertainty(self.uncertainty_sigma)
         
         if self.speed_polar_diagram is not None:
             displacement_xy = self.calculate_displacement(local_winds, local_currents, bearing_with_uncertainty, timestep)
-            direction_of_displacement = pytheas.utilities.direction_from_displacement(displacement_xy)
-            distance_of_displacement = np.linalg.norm(displacement_xy)
-            new_coordinates = gp.distance(distance_of_displacement).destination((self.latitude, self.longitude), bearing = direction_of_displacement)
+            dx, dy = displacement_xy
+            direction_of_displacement = math.atan2(dx, dy)
+            distance_of_displacement = math.hypot(dx, dy)
+            new_latitude, new_longitude = _destination(self.latitude, self.longitude,
+                                                       direction_of_displacement, distance_of_displacement)
             
         else:
             raise ValueError('There is no polar diagram attached!')
             # TODO write logic for generic displacement without polar diagram
             
-        self.latitude = new_coordinates.latitude
-        self.longitude = new_coordinates.longitude
-        self.trajectory.append((new_coordinates.latitude, new_coordinates.longitude))
\ No newline at end of file
+        self.latitude = float(new_latitude)
+        self.longitude = float(new_longitude)
+        if self._trajectory_length == len(self._trajectory):
+            self.reserve_trajectory(self._trajectory_length)
+        self._trajectory[self._trajectory_length] = (self.latitude, self.longitude)
+        self._trajectory_length += 1
\ No newline at end of file
@@ -0,0 +1,259 @@
+"""
+Script that contains the Fleet, a vectorised counterpart of the Boat that moves many boats of the same craft at once.
+"""
+
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from typing import List, Tuple, Union
+
+import pytheas.boat
+import pytheas.kernels
+import pytheas.utilities
+
+# single precision is enough for the polar tables, bearings, winds and currents. Positions, distances and trajectories
+# are accumulated over many steps and are kept in double precision
+STATE_DTYPE = np.float32
+# approximate number of bearing errors drawn at once when the fleet runs out of them
+NOISE_BLOCK_SIZE = 2**16
+
+
+@dataclass
+class Fleet:
+    """
+    A fleet of boats of the same craft, stored as a structure of arrays.
+
+    Each boat of the fleet behaves as a Boat with a polar diagram, but all boats are advanced together by step_boats().
+    The local winds and currents must be set for every boat before each step, by filling local_winds and local_currents in place
+    (e.g. fleet.local_winds[:] = winds). The polar table, bearings, winds and currents are stored in single precision
+    (STATE_DTYPE), positions and distances in double precision.
+
+    Attributes:
+        craft (str): type of boats (e.g. "Hjortspring")
+        latitude (np.ndarray): current latitudes of the boats. They get updated when running step_boats().
+        longitude (np.ndarray): current longitudes of the boats. They get updated when running step_boats().
+        target (Tuple[float, float]): lat/lon of the target, shared by all boats.
+        speed_polar_diagram (pd.DataFrame): table representing the boat speed polar diagram.
+        leeway_polar_diagram (pd.DataFrame): table representing the boat leeway polar diagram.
+        max_steps (int): maximum number of steps that can be recorded in the trajectory.
+        uncertainty_sigma (Union[float, np.ndarray]): uncertainty of bearing due to navigational error, shared by all boats or one per boat. Defaults to 0.0.
+        rng (np.random.Generator): random generator of the bearing errors. Defaults to None, for a freshly seeded generator.
+        trajectory_path (str): path of a .npy file in which the trajectory is recorded through a memory map, for runs whose
+            trajectory does not fit in memory. It is written to the file by flush_trajectory(), and can be read back with
+            np.load(trajectory_path, mmap_mode='r').
+            Defaults to None, for a trajectory kept in memory.
+        craft_id (int): id of the craft in the registry of pytheas.boat.
+        polar_table (np.ndarray): speed (in m/s) and leeway polar diagrams as a table indexed by [angle/10, wind speed in knots/5].
+        target_latitude (np.ndarray): latitude of the target for each boat, initialised from target. The boats steer towards these.
+        target_longitude (np.ndarray): longitude of the target for each boat, initialised from target. The boats steer towards these.
+        bearing (np.ndarray): bearings of the boats towards the target.
+        distance (np.ndarray): distance travelled by each boat, in km.
+        local_winds (np.ndarray): (N, 2) array containing speed and geographic angle of the wind for each boat.
+        local_currents (np.ndarray): (N, 2) array containing Eastward and Northward speed of currents for each boat.
+        trajectory (np.ndarray): (max_steps + 1, N, 2) buffer of lat/lon of the boats, filled up to n_steps + 1.
+        n_steps (int): number of steps done so far.
+    """
+    craft: str
+    latitude: np.ndarray
+    longitude: np.ndarray
+    target: Tuple[float, float]
+    speed_polar_diagram: pd.DataFrame
+    leeway_polar_diagram: pd.DataFrame
+    max_steps: int
+    uncertainty_sigma: Union[float, np.ndarray] = 0.0
+    rng: np.random.Generator = None
+    trajectory_path: str = None
+    craft_id: int = field(init=False)
+    polar_table: np.ndarray = field(init=False)
+    target_latitude: np.ndarray = field(init=False)
+    target_longitude: np.ndarray = field(init=False)
+    bearing: np.ndarray = field(init=False)
+    distance: np.ndarray = field(init=False)
+    local_winds: np.ndarray = field(init=False)
+    local_currents: np.ndarray = field(init=False)
+    trajectory: np.ndarray = field(init=False)
+    n_steps: int = field(init=False, default=0)
+    _noise: np.ndarray = field(init=False, repr=False)
+    _noise_index: int = field(init=False, repr=False, default=0)
+    _displacement: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.latitude = np.array(self.latitude, dtype=np.float64)
+        self.longitude = np.array(self.longitude, dtype=np.float64)
+        n_boats = len(self.latitude)
+        self.uncertainty_sigma = np.broadcast_to(np.asarray(self.uncertainty_sigma, dtype=np.float64), (n_boats,)).copy()
+        if self.rng is None:
+            self.rng = np.random.default_rng()
+        self._noise = np.empty((0, n_boats))
+
+        self.craft_id = pytheas.boat.register_craft(self.craft, self.speed_polar_diagram, self.leeway_polar_diagram)
+        self.polar_table = pytheas.boat.CRAFT_POLAR_TABLES[self.craft_id].astype(STATE_DTYPE)
+
+        self.target_latitude = np.full(n_boats, self.target[0], dtype=np.float64)
+        self.target_longitude = np.full(n_boats, self.target[1], dtype=np.float64)
+        self.bearing = pytheas.utilities.bearing_from_latlon_vec(self.latitude, self.longitude, self.target_latitude, self.target_longitude).astype(STATE_DTYPE)
+        self.distance = np.zeros(n_boats)
+        self.local_winds = np.zeros((n_boats, 2), dtype=STATE_DTYPE)
+        self.local_currents = np.zeros((n_boats, 2), dtype=STATE_DTYPE)
+        # scratch buffer of the NumPy step, reused at every step
+        self._displacement = np.empty((n_boats, 2))
+
+        if self.trajectory_path is None:
+            self.trajectory = np.empty((self.max_steps + 1, n_boats, 2))
+        else:
+            self.trajectory = np.lib.format.open_memmap(self.trajectory_path, mode='w+', dtype=np.float64, shape=(self.max_steps + 1, n_boats, 2))
+        self.trajectory[0, :, 0] = self.latitude
+        self.trajectory[0, :, 1] = self.longitude
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def flush_trajectory(self):
+        """Writes the trajectory recorded so far to its file. It does nothing for a trajectory kept in memory."""
+        if isinstance(self.trajectory, np.memmap):
+            self.trajectory.flush()
+
+    def read_trajectory(self) -> np.ndarray:
+        """Returns the positions recorded so far, without copying them from the trajectory buffer or file.
+
+        Returns:
+            np.ndarray: (n_steps + 1, N, 2) view of the lat/lon of the boats, starting with their initial positions
+        """
+        return self.trajectory[:self.n_steps + 1]
+
+    def prime_noise(self, n_steps: int):
+        """Draws at once the random numbers of the bearing errors of all boats for the next n_steps steps, discarding those drawn before.
+
+        They are kept as standard normals and only scaled by uncertainty_sigma when used, so that changes to it apply right away.
+
+        Args:
+            n_steps (int): number of steps for which the bearing errors are drawn
+        """
+        self._noise = self.rng.standard_normal((n_steps, len(self)))
+        self._noise_index = 0
+
+    @classmethod
+    def from_boats(cls, boats: List["pytheas.boat.Boat"], max_steps: int) -> "Fleet":
+        """Creates a fleet from boats of the same craft heading to the same target, keeping the position and uncertainty of each boat.
+
+        Args:
+            boats (List[Boat]): boats to gather in the fleet
+            max_steps (int): maximum number of steps that can be recorded in the trajectory
+
+        Raises:
+            ValueError: Raised if there are no boats
+            ValueError: Raised if the boats are not of the same craft with the same polar diagrams, or do not share their target
+
+        Returns:
+            Fleet: a fleet with one boat for each of the given boats
+        """
+        if len(boats) == 0:
+            raise ValueError("A fleet needs at least one boat")
+        first_boat = boats[0]
+        for boat in boats[1:]:
+            # the same craft can be registered with several polar diagrams, so the boats are compared by the id of their craft
+            if boat.craft_id != first_boat.craft_id or tuple(boat.target) != tuple(first_boat.target):
+                raise ValueError(f"All boats of a fleet must be of the same craft and share their target ({boat.craft} #{boat.craft_id} to {boat.target}, "
+                                 f"{first_boat.craft} #{first_boat.craft_id} to {first_boat.target})")
+
+        return cls(
+            craft = first_boat.craft,
+            latitude = [boat.latitude for boat in boats],
+            longitude = [boat.longitude for boat in boats],
+            target = tuple(first_boat.target),
+            speed_polar_diagram = first_boat.speed_polar_diagram,
+            leeway_polar_diagram = first_boat.leeway_polar_diagram,
+            max_steps = max_steps,
+            uncertainty_sigma = [boat.uncertainty_sigma for boat in boats]
+        )
+
+
+def step_boats(fleet: Fleet, timestep: int):
+    """Advances all the boats of a fleet by one time step. It is the vectorised version of Boat.move_boat().
+    
+    The boats are moved by the compiled kernel when Numba is installed, and with NumPy otherwise.
+
+    Args:
+        fleet (Fleet): the fleet to move, with local_winds and local_currents set for the current step.
+        timestep (int): time between each step (in minutes)
+
+    Raises:
+        ValueError: Raised if the trajectory buffer of the fleet is full
+        ValueError: Raised if any wind speed is negative or NaN
+        ValueError: Raised if any current is NaN or infinite
+    """
+    if fleet.n_steps >= fleet.max_steps:
+        raise ValueError(f"The trajectory buffer is full ({fleet.max_steps} steps)")
+    # winds and currents replaced by arrays of another type are brought back to single precision, so that the kernel
+    # is only compiled for one layout
+    fleet.local_winds = np.ascontiguousarray(fleet.local_winds, dtype=STATE_DTYPE)
+    fleet.local_currents = np.ascontiguousarray(fleet.local_currents, dtype=STATE_DTYPE)
+    # winds and currents are validated once for the whole fleet, the step itself only clamps winds to the polar diagrams.
+    # The checks are written so that NaN values, which would stay in the positions forever, are rejected too
+    if not np.all(fleet.local_winds[:, 0] >= 0):
+        raise ValueError(f"Wind speed is negative or missing ({np.nanmin(fleet.local_winds[:, 0])} m/s)")
+    if not np.all(np.isfinite(fleet.local_currents)):
+        raise ValueError("Currents are missing or infinite")
+    
+    if fleet._noise_index == len(fleet._noise):
+        fleet.prime_noise(max(1, NOISE_BLOCK_SIZE // len(fleet)))
+    bearing_errors = np.deg2rad(fleet.uncertainty_sigma) * fleet._noise[fleet._noise_index]
+    fleet._noise_index += 1
+    timestep_seconds = timestep * 60.
+    
+    if pytheas.kernels.NUMBA_AVAILABLE:
+        if len(fleet) >= pytheas.kernels.PARALLEL_FLEET_SIZE:
+            step_kernel = pytheas.kernels._step_kernel_batch
+        else:
+            step_kernel = pytheas.kernels._step_kernel_batch_serial
+        step_kernel(fleet.latitude, fleet.longitude, fleet.target_latitude, fleet.target_longitude,
+                    fleet.local_winds, fleet.local_currents, bearing_errors,
+                    fleet.polar_table, timestep_seconds,
+                    fleet.bearing, fleet.distance, fleet.trajectory[fleet.n_steps + 1])
+    else:
+        _step_boats_numpy(fleet, bearing_errors, timestep_seconds)
+        fleet.trajectory[fleet.n_steps + 1, :, 0] = fleet.latitude
+        fleet.trajectory[fleet.n_steps + 1, :, 1] = fleet.longitude
+
+    fleet.n_steps += 1
+
+
+def _step_boats_numpy(fleet: Fleet, bearing_errors: np.ndarray, timestep_seconds: float):
+    """Moves all the boats of a fleet by one time step with NumPy operations on the whole fleet.
+
+    Args:
+        fleet (Fleet): the fleet to move, with local_winds and local_currents set for the current step.
+        bearing_errors (np.ndarray): errors added to the bearings due to navigational uncertainty, in radians
+        timestep_seconds (float): time between each step (in seconds)
+    """
+    # first, update the bearing based on the local position, then add uncertainty. The targets of the boats are read as in
+    # the compiled kernel
+    bearing = pytheas.utilities.bearing_from_latlon_vec(fleet.latitude, fleet.longitude, fleet.target_latitude, fleet.target_longitude)
+    fleet.bearing[:] = bearing
+    bearing_with_uncertainty = bearing + np.rad2deg(bearing_errors)
+
+    # find angle of wind compared to bearing of boats, the polar diagram is symmetric
+    effective_wind_angle = pytheas.utilities.difference_between_geographic_angles_vec(bearing_with_uncertainty, fleet.local_winds[:, 1])
+    wind_sign = np.sign(effective_wind_angle)
+    abs_wind_angle = np.abs(effective_wind_angle)
+    wind_speed_knots = pytheas.utilities.si_to_knots(fleet.local_winds[:, 0])
+
+    paddling_speed, leeway = pytheas.utilities.polar_lookup_vec(abs_wind_angle, wind_speed_knots, fleet.polar_table)
+    leeway_angle = wind_sign*leeway
+
+    # paddling_speed is in m/s, displacement is in km. It is computed in place in the scratch buffer of the fleet
+    effective_direction = np.deg2rad(bearing_with_uncertainty - leeway_angle)
+    displacement = fleet._displacement
+    dx = displacement[:, 0]
+    dy = displacement[:, 1]
+    np.sin(effective_direction, out=dx)
+    np.cos(effective_direction, out=dy)
+    displacement *= paddling_speed[:, None]
+    displacement += fleet.local_currents
+    displacement *= timestep_seconds / 1000
+
+    direction_of_displacement = np.rad2deg(np.arctan2(dx, dy))
+    distance_of_displacement = np.hypot(dx, dy)
+    fleet.latitude[:], fleet.longitude[:] = pytheas.utilities.destination_from_latlon_vec(
+        fleet.latitude, fleet.longitude, direction_of_displacement, distance_of_displacement)
+    fleet.distance += distance_of_displacement
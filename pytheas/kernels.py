@@ -0,0 +1,247 @@
+"""
+Script that contains the compiled numerical kernels used to move boats.
+
+The kernels are compiled with Numba when it is installed. Numba is optional: without it, the same functions run as plain Python.
+"""
+
+import math
+import types
+import numpy as np
+
+from pytheas.utilities import EARTH_RADIUS_KM, KNOTS_PER_SI
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+DEGREES_TO_RADIANS = math.pi / 180
+# the rows of the polar tables are every 10 degrees
+RADIANS_TO_ROWS = 18 / math.pi
+# fleets smaller than this are moved by the serial kernel, as the parallel one costs more to dispatch than it saves
+PARALLEL_FLEET_SIZE = 32
+
+
+@njit(cache=True, fastmath=True)
+def _polar_lookup(angle_position: float, wind_speed_knots: float, polar_table):
+    """Interpolates bilinearly the speed and leeway polar diagrams between their rows (every 10 deg) and columns (every 5 knots).
+
+    Angles and wind speeds outside of the polar diagrams are clamped to their edges, without branching.
+
+    Args:
+        angle_position (float): absolute angle between the wind and the bearing, in rows of the table (i.e. in units of 10 degrees)
+        wind_speed_knots (float): speed of the wind in knots
+        polar_table: speed (in m/s) and leeway polar diagrams indexed by [angle/10][wind speed in knots/5], as an array or nested lists
+
+    Returns:
+        Tuple[float, float]: speed in m/s of the paddling crew and leeway angle in degrees
+    """
+    angle_position = min(angle_position, 18.0)
+    angle_index = min(int(angle_position), 17)
+    angle_fraction = angle_position - angle_index
+    speed_position = max(0.0, min(wind_speed_knots, 30.0)) / 5
+    speed_index = min(int(speed_position), 5)
+    speed_fraction = speed_position - speed_index
+
+    weight_00 = (1 - angle_fraction) * (1 - speed_fraction)
+    weight_10 = angle_fraction * (1 - speed_fraction)
+    weight_01 = (1 - angle_fraction) * speed_fraction
+    weight_11 = angle_fraction * speed_fraction
+    lower_row = polar_table[angle_index]
+    upper_row = polar_table[angle_index + 1]
+    cell_00 = lower_row[speed_index]
+    cell_10 = upper_row[speed_index]
+    cell_01 = lower_row[speed_index + 1]
+    cell_11 = upper_row[speed_index + 1]
+    speed = weight_00 * cell_00[0] + weight_10 * cell_10[0] + weight_01 * cell_01[0] + weight_11 * cell_11[0]
+    leeway = weight_00 * cell_00[1] + weight_10 * cell_10[1] + weight_01 * cell_01[1] + weight_11 * cell_11[1]
+
+    return speed, leeway
+
+
+@njit(cache=True, fastmath=True)
+def _bearing(latitude: float, longitude: float, sin_target_latitude: float, cos_target_latitude: float, target_longitude: float):
+    """Gives the angle between a position and a target, as utilities.bearing_from_latlon() does, from the precomputed
+    trigonometric functions of the latitude of the target.
+
+    Args:
+        latitude (float): current latitude in degrees
+        longitude (float): current longitude in degrees
+        sin_target_latitude (float): sine of the latitude of the target
+        cos_target_latitude (float): cosine of the latitude of the target
+        target_longitude (float): longitude of the target in degrees
+
+    Returns:
+        float: bearing towards the target in radians, between -pi and pi
+    """
+    local_latitude = math.radians(latitude)
+    delta_longitude = math.radians(target_longitude - longitude)
+    x = math.sin(delta_longitude) * cos_target_latitude
+    y = math.cos(local_latitude) * sin_target_latitude - math.sin(local_latitude) * cos_target_latitude * math.cos(delta_longitude)
+
+    return math.atan2(x, y)
+
+
+@njit(cache=True, fastmath=True, inline='always')
+def _difference_between_geographic_angles(bearing: float, angle_wind: float) -> float:
+    """Radians version of utilities.difference_between_geographic_angles().
+
+    Args:
+        bearing (float): bearing of the boat in radians, between -pi and pi
+        angle_wind (float): geographic angle of the wind in radians, between 0 and 2*pi
+
+    Returns:
+        float: effective wind angle in radians
+    """
+    if angle_wind > math.pi:
+        angle_wind -= 2*math.pi
+    effective_wind_angle = angle_wind - bearing
+    if effective_wind_angle > math.pi:
+        effective_wind_angle = 2*math.pi - effective_wind_angle
+    if effective_wind_angle < -math.pi:
+        effective_wind_angle = 2*math.pi + effective_wind_angle
+
+    return effective_wind_angle
+
+
+@njit(cache=True, fastmath=True, inline='always')
+def _geographic_angle_to_xy(angle: float):
+    """Radians version of utilities.geographic_angle_to_xy().
+
+    Args:
+        angle (float): geographic angle in radians
+
+    Returns:
+        Tuple[float, float]: dx (horizontal Eastward) and dy (vertical Northward)
+    """
+    return math.sin(angle), math.cos(angle)
+
+
+@njit(cache=True, fastmath=True)
+def _destination(latitude: float, longitude: float, direction: float, distance: float):
+    """Solves the direct geodesic problem on a sphere, as utilities.destination_from_latlon_vec() does for arrays.
+
+    Args:
+        latitude (float): latitude of the starting point in degrees
+        longitude (float): longitude of the starting point in degrees
+        direction (float): geographic angle of the displacement in radians
+        distance (float): distance travelled in km
+
+    Returns:
+        Tuple[float, float]: latitude and longitude of the destination in degrees, with longitude between -180 and 180
+    """
+    latitude_rad = math.radians(latitude)
+    angular_distance = distance / EARTH_RADIUS_KM
+    new_latitude = math.asin(math.sin(latitude_rad) * math.cos(angular_distance)
+                             + math.cos(latitude_rad) * math.sin(angular_distance) * math.cos(direction))
+    new_longitude = math.radians(longitude) + math.atan2(math.sin(direction) * math.sin(angular_distance) * math.cos(latitude_rad),
+                                                         math.cos(angular_distance) - math.sin(latitude_rad) * math.sin(new_latitude))
+
+    return math.degrees(new_latitude), (math.degrees(new_longitude) + 540) % 360 - 180
+
+
+@njit(cache=True, fastmath=True)
+def _step_kernel(latitude: float, longitude: float, target_latitude: float, target_longitude: float,
+                 wind_speed: float, wind_direction: float, current_east: float, current_north: float,
+                 bearing_error: float, polar_table: np.ndarray, timestep_seconds: float):
+    """Moves a single boat by one time step. It is the compiled equivalent of Boat.move_boat().
+
+    Args:
+        latitude (float): current latitude of the boat
+        longitude (float): current longitude of the boat
+        target_latitude (float): latitude of the target
+        target_longitude (float): longitude of the target
+        wind_speed (float): speed of the wind in m/s
+        wind_direction (float): geographic angle of the wind in degrees
+        current_east (float): Eastward speed of currents in m/s
+        current_north (float): Northward speed of currents in m/s
+        bearing_error (float): error added to the bearing due to navigational uncertainty, in radians
+        polar_table (np.ndarray): speed (in m/s) and leeway polar diagrams as a table indexed by [angle/10, wind speed in knots/5]
+        timestep_seconds (float): time between each step (in seconds)
+
+    Returns:
+        Tuple[float, float, float, float]: new latitude, new longitude, bearing towards the target and travelled distance in km
+    """
+    # bearing towards the target. All angles are kept in radians, between -pi and pi, until the end of the step
+    target_latitude_rad = math.radians(target_latitude)
+    bearing = _bearing(latitude, longitude, math.sin(target_latitude_rad), math.cos(target_latitude_rad), target_longitude)
+    bearing_with_uncertainty = bearing + bearing_error
+    if bearing_with_uncertainty > math.pi:
+        bearing_with_uncertainty -= 2*math.pi
+    elif bearing_with_uncertainty < -math.pi:
+        bearing_with_uncertainty += 2*math.pi
+
+    # find angle of wind compared to bearing of boat
+    effective_wind_angle = _difference_between_geographic_angles(bearing_with_uncertainty, math.radians(wind_direction))
+
+    # the wind speed is validated before calling the kernel, out of the loop over boats
+    paddling_speed, leeway = _polar_lookup(abs(effective_wind_angle) * RADIANS_TO_ROWS, wind_speed * KNOTS_PER_SI, polar_table)
+    leeway_angle = leeway * DEGREES_TO_RADIANS
+    if effective_wind_angle < 0:
+        leeway_angle = -leeway_angle
+    elif effective_wind_angle == 0:
+        leeway_angle = 0.0
+
+    # displacement in km
+    movement_dx, movement_dy = _geographic_angle_to_xy(bearing_with_uncertainty - leeway_angle)
+    speed_to_km = timestep_seconds / 1000
+    dx = (paddling_speed*movement_dx + current_east) * speed_to_km
+    dy = (paddling_speed*movement_dy + current_north) * speed_to_km
+    distance = math.hypot(dx, dy)
+    new_latitude, new_longitude = _destination(latitude, longitude, math.atan2(dx, dy), distance)
+
+    return new_latitude, new_longitude, (math.degrees(bearing) + 360) % 360, distance
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def _step_kernel_batch(latitudes: np.ndarray, longitudes: np.ndarray, target_latitudes: np.ndarray, target_longitudes: np.ndarray,
+                       winds: np.ndarray, currents: np.ndarray, bearing_errors: np.ndarray,
+                       polar_table: np.ndarray, timestep_seconds: float,
+                       bearings: np.ndarray, distances: np.ndarray, positions: np.ndarray):
+    """Moves all boats of a fleet by one time step, updating latitudes, longitudes, bearings and distances in place.
+
+    The new positions are also written to positions, typically the row of the trajectory for this step, in the same pass.
+
+    Args:
+        latitudes (np.ndarray): current latitudes of the boats
+        longitudes (np.ndarray): current longitudes of the boats
+        target_latitudes (np.ndarray): latitudes of the targets
+        target_longitudes (np.ndarray): longitudes of the targets
+        winds (np.ndarray): (N, 2) array containing speed and geographic angle of the wind for each boat
+        currents (np.ndarray): (N, 2) array containing Eastward and Northward speed of currents for each boat
+        bearing_errors (np.ndarray): errors added to the bearings due to navigational uncertainty, in radians
+        polar_table (np.ndarray): speed (in m/s) and leeway polar diagrams as a table indexed by [angle/10, wind speed in knots/5]
+        timestep_seconds (float): time between each step (in seconds)
+        bearings (np.ndarray): bearings of the boats towards the targets, overwritten
+        distances (np.ndarray): distances travelled by the boats, incremented
+        positions (np.ndarray): (N, 2) array receiving the new latitudes and longitudes
+    """
+    for i in prange(len(latitudes)):
+        latitude, longitude, bearing, distance = _step_kernel(latitudes[i], longitudes[i], target_latitudes[i], target_longitudes[i],
+                                                              winds[i, 0], winds[i, 1], currents[i, 0], currents[i, 1],
+                                                              bearing_errors[i], polar_table, timestep_seconds)
+        latitudes[i] = latitude
+        longitudes[i] = longitude
+        positions[i, 0] = latitude
+        positions[i, 1] = longitude
+        bearings[i] = bearing
+        distances[i] += distance
+
+
+# serial version of _step_kernel_batch(), for fleets too small to be worth starting the threads of the parallel loop. It compiles
+# the same loop without parallel, where prange behaves as range, from a renamed copy so that Numba caches it apart from the parallel one.
+# Without Numba (or with NUMBA_DISABLE_JIT), the loop is already a plain Python function
+if hasattr(_step_kernel_batch, 'py_func'):
+    _step_kernel_batch_serial = types.FunctionType(_step_kernel_batch.py_func.__code__, globals(), '_step_kernel_batch_serial')
+    _step_kernel_batch_serial.__qualname__ = '_step_kernel_batch_serial'
+    _step_kernel_batch_serial = njit(cache=True, fastmath=True)(_step_kernel_batch_serial)
+else:
+    _step_kernel_batch_serial = _step_kernel_batch
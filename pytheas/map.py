@@ -22,14 +22,14 @@ class Map:
         self.current = current_data_path
         self.waves = waves_data_path
         
-    def measure_winds(location: np.ndarray, time: pd.Timestamp):
+    def measure_winds(self, location: np.ndarray, time: pd.Timestamp):
         # TODO write wind measuring function
         pass
     
-    def measure_currents(location: np.ndarray, time: pd.Timestamp):
+    def measure_currents(self, location: np.ndarray, time: pd.Timestamp):
         # TODO write current measuring function
         pass
     
-    def measure_waves (location: np.ndarray, time: pd.Timestamp):
+    def measure_waves(self, location: np.ndarray, time: pd.Timestamp):
         # TODO write waves measuring function
         pass
\ No newline at end of file
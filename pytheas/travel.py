@@ -34,6 +34,15 @@ class Travel:
         self.target = target
         
         self.current_time = start_time
+        # the clock of the travel is kept as an integer number of minutes, current_time is derived from it
+        self.minutes_elapsed = 0
+        self.max_steps = -(-max_duration * 60 // timestep)
+        # times of the steps are built from integer nanoseconds, which is cheaper than adding a pd.Timedelta at every step
+        self._start_ns = pd.Timestamp(start_time).value
+        self._timestep_ns = timestep * 60 * 10**9
+        
+        # the whole trajectory of the travel is allocated at once
+        self.boat.reserve_trajectory(self.max_steps)
     
     
     def step(self):
@@ -46,11 +55,12 @@ class Travel:
         self.boat.move_boat(wind_here_and_now, current_here_and_now, self.timestep)
         
     def run(self):
-        max_date = self.start_time + pd.Timedelta(hours=self.max_duration)
-        
-        while self.current_time < max_date:
+        # the travel resumes from the steps already taken, so running it again once finished does nothing
+        for step_index in range(self.minutes_elapsed // self.timestep, self.max_steps):
+            self.current_time = pd.Timestamp(self._start_ns + step_index * self._timestep_ns, tz=self.start_time.tz)
             self.step()
-            self.current_time += pd.Timedelta(minutes=self.timestep)
+            self.minutes_elapsed += self.timestep
+        self.current_time = pd.Timestamp(self._start_ns + self.minutes_elapsed // self.timestep * self._timestep_ns, tz=self.start_time.tz)
     
     
     def output_geojson():
@@ -2,10 +2,14 @@
 Script that contains utility functions that are not used within a particular class.
 """
 
-import geopy.distance as gp
+import math
 import numpy as np
+import pandas as pd
 from typing import Tuple
 
+KNOTS_PER_SI = 1.94384
+EARTH_RADIUS_KM = 6371.0088
+
 
 def distance_km(origin: Tuple[float, float], target: Tuple[float, float]) -> float:
     """Calculates distance in km between two lon/lat points, in km
@@ -17,6 +21,9 @@ def distance_km(origin: Tuple[float, float], target: Tuple[float, float]) -> flo
     Returns:
         float: distance between origin and target
     """
+    # geopy is only needed here, import it lazily to keep it out of the simulation start-up
+    import geopy.distance as gp
+    
     return gp.distance(gp.lonlat(*origin), gp.lonlat(*target)).km
 
 
@@ -24,25 +31,24 @@ def bearing_from_latlon(position: Tuple[float, float], target: Tuple[float, floa
     """Gives angle between a coordinate and a target (in degrees with respect to North). Taken from Voyager.
 
     Args:
-        position (np.ndarray): current position (lat/lon)
-        target (np.ndarray): target position (lat/lon)
+        position (Tuple[float, float]): current position (lat/lon)
+        target (Tuple[float, float]): target position (lat/lon)
     Returns:
         float: bearing (angle) between a position and a target in degrees
     """
-
-    local_latitude = np.deg2rad(position[0])
-    local_longitude = np.deg2rad(position[1])
-    target_latitude = np.deg2rad(target[0])
-    target_longitude = np.deg2rad(target[1])
-    # delta_longitude = np.deg2rad(position[1]-target[1])
+    # scalar inputs, the math module avoids the overhead of NumPy functions
+    local_latitude = math.radians(position[0])
+    local_longitude = math.radians(position[1])
+    target_latitude = math.radians(target[0])
+    target_longitude = math.radians(target[1])
     delta_longitude = target_longitude - local_longitude
 
-    x = np.sin(delta_longitude) * np.cos(target_latitude)
-    y = np.cos(local_latitude) * np.sin(target_latitude) - np.sin(local_latitude) * np.cos(target_latitude) * np.cos(delta_longitude)
+    x = math.sin(delta_longitude) * math.cos(target_latitude)
+    y = math.cos(local_latitude) * math.sin(target_latitude) - math.sin(local_latitude) * math.cos(target_latitude) * math.cos(delta_longitude)
 
-    bearing = np.arctan2(x, y)
+    bearing = math.atan2(x, y)
 
-    bearing = (np.rad2deg(bearing) + 360) % 360
+    bearing = (math.degrees(bearing) + 360) % 360
 
     return bearing
 
@@ -57,7 +63,7 @@ def knots_to_si(knots: float) -> float:
         float: Speed in metres/second
     """
 
-    return knots / 1.94384
+    return knots / KNOTS_PER_SI
 
 
 def si_to_knots(si: float) -> float:
@@ -70,12 +76,14 @@ def si_to_knots(si: float) -> float:
         float: Speed in knots
     """
 
-    return si * 1.94384
+    return si * KNOTS_PER_SI
 
 
 def angle_uncertainty(sigma=0) -> float:
     """Returns an angle error in radiants. 
     """
+    if sigma == 0:
+        return 0.0
     angle_error = np.random.normal(0, sigma)
     
     return angle_error
@@ -90,9 +98,9 @@ def geographic_angle_to_xy(angle: float) -> np.ndarray:
     Returns:
         np.ndarray: array with dx (horizontal Eastward) and dy (vertical Northward)
     """
-    angle_radians = np.deg2rad(angle)
-    dx = np.sin(np.pi - angle_radians)
-    dy = np.cos(angle_radians)
+    angle_radians = math.radians(angle)
+    dx = math.sin(angle_radians)
+    dy = math.cos(angle_radians)
     
     return np.array([dx, dy])
 
@@ -120,4 +128,148 @@ def direction_from_displacement(displacement: np.ndarray) -> float:
     
     bearing = np.rad2deg(bearing_rad)
     
-    return bearing
\ No newline at end of file
+    return bearing
+
+
+def polar_diagram_to_table(polar_diagram: pd.DataFrame) -> np.ndarray:
+    """Converts a polar diagram to a dense table, indexed by [angle/10, wind speed in knots/5].
+
+    Args:
+        polar_diagram (pd.DataFrame): polar diagram with wind angles (0 to 180, every 10 degrees) as index
+                                      and wind speeds in knots (0 to 30, every 5 knots) as columns
+
+    Raises:
+        ValueError: Raised if any wind angle or wind speed of the table is missing from the polar diagram
+
+    Returns:
+        np.ndarray: C-contiguous table of shape (19, 7) with the values of the polar diagram
+    """
+    # the rows and columns are selected by label, so that the table does not depend on their order in the file
+    angles = list(range(0, 181, 10))
+    speeds = [str(speed) for speed in range(0, 31, 5)]
+    polar_diagram = polar_diagram.rename(index=int, columns=str)
+    missing_angles = sorted(set(angles) - set(polar_diagram.index))
+    missing_speeds = sorted(set(speeds) - set(polar_diagram.columns), key=int)
+    if missing_angles or missing_speeds:
+        raise ValueError(f"The polar diagram is missing wind angles {missing_angles} or wind speeds {missing_speeds}")
+
+    return np.ascontiguousarray(polar_diagram.loc[angles, speeds].to_numpy(dtype=np.float64))
+
+
+def polar_diagrams_to_table(speed_polar_diagram: pd.DataFrame, leeway_polar_diagram: pd.DataFrame) -> np.ndarray:
+    """Combines the speed and leeway polar diagrams in a single table, with speeds already converted to m/s.
+
+    Args:
+        speed_polar_diagram (pd.DataFrame): table representing the boat speed polar diagram (in knots)
+        leeway_polar_diagram (pd.DataFrame): table representing the boat leeway polar diagram (in degrees)
+
+    Returns:
+        np.ndarray: table of shape (19, 7, 2) indexed by [angle/10, wind speed in knots/5], with speed in m/s and leeway in degrees
+    """
+    speed_table = knots_to_si(polar_diagram_to_table(speed_polar_diagram))
+    leeway_table = polar_diagram_to_table(leeway_polar_diagram)
+
+    return np.stack([speed_table, leeway_table], axis=-1)
+
+
+def polar_lookup_vec(abs_wind_angles: np.ndarray, wind_speeds_knots: np.ndarray, polar_table: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Interpolates bilinearly a polar table between its rows (every 10 deg) and columns (every 5 knots) for many boats at once.
+
+    Angles and wind speeds outside of the polar diagrams are clamped to their edges.
+
+    Args:
+        abs_wind_angles (np.ndarray): absolute angles between the wind and the bearings, in degrees between 0 and 180
+        wind_speeds_knots (np.ndarray): speeds of the wind in knots
+        polar_table (np.ndarray): speed and leeway polar diagrams as returned by polar_diagrams_to_table()
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: speeds in m/s of the paddling crews and leeway angles in degrees
+    """
+    angle_position = np.minimum(abs_wind_angles, 180) / 10
+    angle_index = np.minimum(angle_position.astype(np.intp), 17)
+    angle_fraction = (angle_position - angle_index)[:, None]
+    speed_position = np.clip(wind_speeds_knots, 0, 30) / 5
+    speed_index = np.minimum(speed_position.astype(np.intp), 5)
+    speed_fraction = (speed_position - speed_index)[:, None]
+
+    # one gather per corner returns both the speed and the leeway of each boat
+    lower_speed = polar_table[angle_index, speed_index] + speed_fraction * (polar_table[angle_index, speed_index + 1] - polar_table[angle_index, speed_index])
+    upper_speed = (polar_table[angle_index + 1, speed_index]
+                   + speed_fraction * (polar_table[angle_index + 1, speed_index + 1] - polar_table[angle_index + 1, speed_index]))
+    polar = lower_speed + angle_fraction * (upper_speed - lower_speed)
+
+    return polar[:, 0], polar[:, 1]
+
+
+def bearing_from_latlon_vec(latitudes: np.ndarray, longitudes: np.ndarray,
+                            target_latitudes: np.ndarray, target_longitudes: np.ndarray) -> np.ndarray:
+    """Vectorised version of bearing_from_latlon, working on arrays of positions and targets.
+    
+    A target shared by all positions can be given as two scalars, so that its trigonometric functions are only calculated once.
+
+    Args:
+        latitudes (np.ndarray): current latitudes
+        longitudes (np.ndarray): current longitudes
+        target_latitudes (np.ndarray): latitudes of the targets
+        target_longitudes (np.ndarray): longitudes of the targets
+
+    Returns:
+        np.ndarray: bearings (angles) between each position and its target in degrees
+    """
+    local_latitude = np.deg2rad(latitudes)
+    target_latitude = np.deg2rad(target_latitudes)
+    delta_longitude = np.deg2rad(target_longitudes) - np.deg2rad(longitudes)
+    sin_target_latitude = np.sin(target_latitude)
+    cos_target_latitude = np.cos(target_latitude)
+
+    x = np.sin(delta_longitude) * cos_target_latitude
+    y = np.cos(local_latitude) * sin_target_latitude - np.sin(local_latitude) * cos_target_latitude * np.cos(delta_longitude)
+
+    return (np.rad2deg(np.arctan2(x, y)) + 360) % 360
+
+
+def difference_between_geographic_angles_vec(bearing: np.ndarray, angle_wind: np.ndarray) -> np.ndarray:
+    """Vectorised version of difference_between_geographic_angles.
+
+    Args:
+        bearing (np.ndarray): bearings in degrees
+        angle_wind (np.ndarray): geographic angles of the wind in degrees
+
+    Returns:
+        np.ndarray: effective wind angles in degrees
+    """
+    bearing = np.where(bearing > 180, bearing - 360, bearing)
+    angle_wind = np.where(angle_wind > 180, angle_wind - 360, angle_wind)
+
+    effective_wind_angle = angle_wind - bearing
+    effective_wind_angle = np.where(effective_wind_angle > 180, 360 - effective_wind_angle, effective_wind_angle)
+    effective_wind_angle = np.where(effective_wind_angle < -180, 360 + effective_wind_angle, effective_wind_angle)
+
+    return effective_wind_angle
+
+
+def destination_from_latlon_vec(latitudes: np.ndarray, longitudes: np.ndarray,
+                                bearings: np.ndarray, distances_km: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Calculates the points reached by travelling a distance along a bearing on a sphere (direct geodesic problem).
+
+    Args:
+        latitudes (np.ndarray): latitudes of the starting points
+        longitudes (np.ndarray): longitudes of the starting points
+        bearings (np.ndarray): geographic angles of travel in degrees
+        distances_km (np.ndarray): travelled distances in km
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: latitudes and longitudes of the points of arrival
+    """
+    latitude = np.deg2rad(latitudes)
+    longitude = np.deg2rad(longitudes)
+    bearing = np.deg2rad(bearings)
+    angular_distance = distances_km / EARTH_RADIUS_KM
+
+    new_latitude = np.arcsin(np.sin(latitude) * np.cos(angular_distance) + np.cos(latitude) * np.sin(angular_distance) * np.cos(bearing))
+    new_longitude = longitude + np.arctan2(np.sin(bearing) * np.sin(angular_distance) * np.cos(latitude),
+                                           np.cos(angular_distance) - np.sin(latitude) * np.sin(new_latitude))
+
+    new_longitude = (np.rad2deg(new_longitude) + 540) % 360 - 180
+
+    return np.rad2deg(new_latitude), new_longitude
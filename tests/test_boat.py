@@ -1,6 +1,56 @@
 import numpy as np
 import pandas as pd
-from pytheas import boat
+from pytheas import boat, utilities
+
+def test_polar_diagram_lookup():
+    
+    SPEED_POLAR_DIAGRAM_PATH = './configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt'
+    LEEWAY_POLAR_DIAGRAM_PATH = './configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt'
+    speed_polar_diagram = pd.read_csv(SPEED_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv(LEEWAY_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    
+    test_boat = boat.Boat(
+        craft = "Hjortspring",
+        latitude = 58,
+        longitude = 12,
+        speed_polar_diagram=speed_polar_diagram,
+        leeway_polar_diagram=leeway_polar_diagram,
+        target = [59, 12]
+    )
+    
+    # wind of 10 knots at 90 degrees from the bearing reads the 10 knots column at row 90
+    winds = np.array([utilities.knots_to_si(10), 90.0])
+    assert abs(test_boat.speed_due_to_wind(winds, 0) - utilities.knots_to_si(speed_polar_diagram['10'][90])) < 1e-10
+    assert abs(test_boat.leeway_due_to_wind(winds, 0) - leeway_polar_diagram['10'][90]) < 1e-10
+    
+    # wind coming from the other side gives the opposite leeway
+    winds = np.array([utilities.knots_to_si(10), 270.0])
+    assert abs(test_boat.leeway_due_to_wind(winds, 0) + leeway_polar_diagram['10'][90]) < 1e-10
+    
+    # wind speeds and angles in between are interpolated between the four surrounding values
+    winds = np.array([utilities.knots_to_si(12.5), 85.0])
+    expected_leeway = (leeway_polar_diagram['10'][80] + leeway_polar_diagram['10'][90] + leeway_polar_diagram['15'][80] + leeway_polar_diagram['15'][90]) / 4
+    assert abs(test_boat.leeway_due_to_wind(winds, 0) - expected_leeway) < 1e-10
+    winds = np.array([utilities.knots_to_si(10), 83.0])
+    expected_leeway = 0.7 * leeway_polar_diagram['10'][80] + 0.3 * leeway_polar_diagram['10'][90]
+    assert abs(test_boat.leeway_due_to_wind(winds, 0) - expected_leeway) < 1e-10
+    
+    # winds stronger than 30 knots are read in the 30 knots column
+    winds = np.array([utilities.knots_to_si(45), 90.0])
+    assert abs(test_boat.speed_due_to_wind(winds, 0) - utilities.knots_to_si(speed_polar_diagram['30'][90])) < 1e-10
+    
+    # the edges of the polar diagrams are read without interpolating beyond them
+    winds = np.array([utilities.knots_to_si(45), 180.0])
+    assert abs(test_boat.speed_due_to_wind(winds, 0) - utilities.knots_to_si(speed_polar_diagram['30'][180])) < 1e-10
+    
+    # missing wind data are rejected rather than read in the 0 knots column
+    winds = np.array([np.nan, 90.0])
+    try:
+        test_boat.speed_due_to_wind(winds, 0)
+        assert False
+    except ValueError:
+        pass
+
 
 def test_calculate_displacement():
     
@@ -74,13 +124,14 @@ def test_calculate_displacement():
     displacement = test_boat.calculate_displacement(winds, currents, bearing, timestep)
     assert displacement[1] - 3.402 < 1e-8
     
-    # Example calculated by hand!
+    # Example calculated by hand! 10 m/s are 19.44 knots, interpolated between the 15 and 20 knots columns at 90 degrees:
+    # speed of 1.2538 knots (0.6450 m/s) with a leeway of 18.07 degrees
     winds = np.array([10.0, 90.0])
     currents = np.array([-0.5, 0.5])
     bearing = 0
     displacement = test_boat.calculate_displacement(winds, currents, bearing, timestep)   
-    assert displacement[0] - (-0.6083) < 1e-3
-    assert displacement[1] - 0.8850 < 1e-3
+    assert abs(displacement[0] - (-0.6301)) < 1e-3
+    assert abs(displacement[1] - 1.0019) < 1e-3
     
 
 def test_generic_displacement():
@@ -102,6 +153,9 @@ def test_move_boat():
         target = [59, 12]
     )
     
+    # boats have a fixed set of attributes
+    assert not hasattr(test_boat, '__dict__')
+    
     old_latitude = test_boat.latitude
     old_longitude = test_boat.longitude
     
@@ -121,4 +175,95 @@ def test_move_boat():
     test_boat.move_boat(winds, currents, timestep)
     assert len(test_boat.trajectory) == 3
     assert test_boat.trajectory[-1][0] > old_latitude
-    assert test_boat.trajectory[-1][1] < old_longitude
\ No newline at end of file
+    assert test_boat.trajectory[-1][1] < old_longitude    
+    
+    # with no winds and no currents, a boat should move straight North towards its target
+    calm_boat = boat.Boat("Hjortspring", 58, 12, [59, 12], speed_polar_diagram=speed_polar_diagram, leeway_polar_diagram=leeway_polar_diagram)
+    calm_boat.move_boat(np.zeros(2), np.zeros(2), timestep)
+    assert len(calm_boat.trajectory) == 2
+    assert calm_boat.trajectory[-1][0] > 58
+    assert abs(calm_boat.trajectory[-1][1] - 12) < 1e-10
+    
+def test_trajectory_growth():
+    SPEED_POLAR_DIAGRAM_PATH = './configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt'
+    LEEWAY_POLAR_DIAGRAM_PATH = './configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt'
+    speed_polar_diagram = pd.read_csv(SPEED_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv(LEEWAY_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    
+    test_boat = boat.Boat(
+        craft = "Hjortspring",
+        latitude = 58,
+        longitude = 12,
+        speed_polar_diagram=speed_polar_diagram,
+        leeway_polar_diagram=leeway_polar_diagram,
+        target = [59, 12],
+        max_steps = 1
+    )
+    
+    # the trajectory keeps all positions when moving for more steps than preallocated
+    winds = np.zeros(2)
+    currents = np.zeros(2)
+    for _ in range(5):
+        test_boat.move_boat(winds, currents, 15)
+    assert test_boat.trajectory.shape == (6, 2)
+    assert tuple(test_boat.trajectory[0]) == (58, 12)
+    assert tuple(test_boat.trajectory[-1]) == (test_boat.latitude, test_boat.longitude)
+    assert np.all(np.linalg.norm(np.diff(test_boat.trajectory, axis=0), axis=1) > 0)
+    
+    # room can be made in advance for a known number of steps
+    test_boat.reserve_trajectory(100)
+    assert len(test_boat._trajectory) >= 106
+    assert tuple(test_boat.trajectory[-1]) == (test_boat.latitude, test_boat.longitude)
+    
+    
+def test_bearing_cache():
+    SPEED_POLAR_DIAGRAM_PATH = './configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt'
+    LEEWAY_POLAR_DIAGRAM_PATH = './configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt'
+    speed_polar_diagram = pd.read_csv(SPEED_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv(LEEWAY_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    
+    test_boat = boat.Boat(
+        craft = "Hjortspring",
+        latitude = 58,
+        longitude = 12,
+        speed_polar_diagram=speed_polar_diagram,
+        leeway_polar_diagram=leeway_polar_diagram,
+        target = [58, 13]
+    )
+    winds = np.zeros(2)
+    currents = np.zeros(2)
+    
+    # a displacement below the tolerance keeps the cached bearing
+    initial_bearing = test_boat.bearing
+    test_boat.latitude += boat.BEARING_TOLERANCE / 2
+    test_boat.move_boat(winds, currents, 15)
+    assert test_boat.bearing == initial_bearing
+    
+    # a larger displacement updates it
+    test_boat.latitude += 0.5
+    test_boat.move_boat(winds, currents, 15)
+    assert test_boat.bearing > initial_bearing
+    
+    # a new target always updates it
+    test_boat.target = [50, 12]
+    test_boat.move_boat(winds, currents, 15)
+    assert 90 < test_boat.bearing < 270
+    
+    
+def test_craft_registry():
+    SPEED_POLAR_DIAGRAM_PATH = './configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt'
+    LEEWAY_POLAR_DIAGRAM_PATH = './configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt'
+    speed_polar_diagram = pd.read_csv(SPEED_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv(LEEWAY_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    
+    # boats of the same craft share their polar table
+    first_boat = boat.Boat("Hjortspring", 58, 12, [59, 12], speed_polar_diagram=speed_polar_diagram, leeway_polar_diagram=leeway_polar_diagram)
+    second_boat = boat.Boat("Hjortspring", 57, 11, [59, 12], speed_polar_diagram=speed_polar_diagram.copy(), leeway_polar_diagram=leeway_polar_diagram)
+    assert first_boat.craft_id == second_boat.craft_id
+    assert first_boat._polar_table is second_boat._polar_table
+    
+    # the same craft with different polar diagrams (e.g. another crew or load) gets its own table
+    third_boat = boat.Boat("Hjortspring", 57, 11, [59, 12], speed_polar_diagram=speed_polar_diagram * 2, leeway_polar_diagram=leeway_polar_diagram)
+    assert third_boat.craft_id != first_boat.craft_id
+    winds = np.array([utilities.knots_to_si(10), 90.0])
+    assert abs(third_boat.speed_due_to_wind(winds, 0) - 2 * first_boat.speed_due_to_wind(winds, 0)) < 1e-10
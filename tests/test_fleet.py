@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import pytheas.kernels
+from pytheas import boat, fleet, utilities
+
+def create_test_fleet(latitudes, longitudes, target, max_steps=10):
+    SPEED_POLAR_DIAGRAM_PATH = './configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt'
+    LEEWAY_POLAR_DIAGRAM_PATH = './configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt'
+    speed_polar_diagram = pd.read_csv(SPEED_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv(LEEWAY_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    
+    return fleet.Fleet(
+        craft = "Hjortspring",
+        latitude = latitudes,
+        longitude = longitudes,
+        target = target,
+        speed_polar_diagram = speed_polar_diagram,
+        leeway_polar_diagram = leeway_polar_diagram,
+        max_steps = max_steps
+    )
+
+
+def test_step_boats():
+    timestep = 15
+    test_fleet = create_test_fleet([58, 58, 58], [12, 12, 12], [59, 12])
+    
+    # first boat: no winds and no currents, it should go North by 3.78 knots during 15 minutes
+    # second boat: slight Northern winds and currents at 45 degrees, it should move towards NNE
+    # third boat: slight Eastern winds and currents at 315 degrees, it should move towards NW
+    test_fleet.local_winds[:] = [[0.0, 0.0], [0.05, 0], [0.05, 90]]
+    test_fleet.local_currents[:] = [[0.0, 0.0], [0.5, 0.5], [-0.5, 0.5]]
+    fleet.step_boats(test_fleet, timestep)
+    
+    assert test_fleet.n_steps == 1
+    assert test_fleet.trajectory[1, 0, 0] > 58
+    assert abs(test_fleet.trajectory[1, 0, 1] - 12) < 1e-10
+    # the polar table is in single precision
+    assert abs(test_fleet.distance[0] - utilities.knots_to_si(3.78)*timestep*60/1000) < 1e-6
+    assert test_fleet.latitude[1] > 58 and test_fleet.longitude[1] > 12
+    assert test_fleet.latitude[2] > 58 and test_fleet.longitude[2] < 12
+    
+    # negative or missing wind speeds, and missing currents, are rejected before moving any boat
+    for winds, currents in [([[0.0, 0.0], [-0.05, 0], [0.05, 90]], np.zeros((3, 2))),
+                            ([[0.0, 0.0], [np.nan, 0], [0.05, 90]], np.zeros((3, 2))),
+                            (np.zeros((3, 2)), [[0.0, 0.0], [np.nan, 0.5], [0.0, 0.0]])]:
+        test_fleet.local_winds[:] = winds
+        test_fleet.local_currents[:] = currents
+        try:
+            fleet.step_boats(test_fleet, timestep)
+            assert False
+        except ValueError:
+            assert test_fleet.n_steps == 1
+            assert np.all(np.isfinite(test_fleet.latitude))
+    
+    # winds and currents replaced by double precision arrays are stored back in single precision
+    test_fleet.local_winds = np.zeros((3, 2))
+    test_fleet.local_currents = np.zeros((3, 2))
+    fleet.step_boats(test_fleet, timestep)
+    assert test_fleet.local_winds.dtype == fleet.STATE_DTYPE and test_fleet.local_currents.dtype == fleet.STATE_DTYPE
+    
+    
+def test_step_boats_trajectory_buffer():
+    test_fleet = create_test_fleet([58, 57], [12, 11], [59, 12], max_steps=2)
+    
+    fleet.step_boats(test_fleet, 15)
+    assert test_fleet.read_trajectory().shape == (2, 2, 2)
+    fleet.step_boats(test_fleet, 15)
+    assert test_fleet.trajectory.shape == (3, 2, 2)
+    assert np.all(test_fleet.trajectory[2, :, 0] == test_fleet.latitude)
+    
+    try:
+        fleet.step_boats(test_fleet, 15)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_step_boats_kernel():
+    # the compiled kernel and the NumPy implementation move the boats in the same way
+    rng = np.random.default_rng(42)
+    n_boats = 50
+    latitudes = rng.uniform(55, 60, n_boats)
+    longitudes = rng.uniform(8, 14, n_boats)
+    winds = np.column_stack([rng.uniform(0, 20, n_boats), rng.uniform(0, 360, n_boats)])
+    currents = rng.uniform(-0.5, 0.5, (n_boats, 2))
+    bearing_errors = rng.normal(0, 0.1, n_boats)
+    # each boat can be given its own target
+    target_latitudes = rng.uniform(55, 60, n_boats)
+    
+    kernel_fleet = create_test_fleet(latitudes, longitudes, [59, 12])
+    numpy_fleet = create_test_fleet(latitudes, longitudes, [59, 12])
+    for test_fleet in [kernel_fleet, numpy_fleet]:
+        test_fleet.target_latitude[:] = target_latitudes
+        test_fleet.local_winds[:] = winds
+        test_fleet.local_currents[:] = currents
+    
+    pytheas.kernels._step_kernel_batch(kernel_fleet.latitude, kernel_fleet.longitude, kernel_fleet.target_latitude, kernel_fleet.target_longitude,
+                                       kernel_fleet.local_winds, kernel_fleet.local_currents, bearing_errors, kernel_fleet.polar_table, 900.,
+                                       kernel_fleet.bearing, kernel_fleet.distance, kernel_fleet.trajectory[1])
+    fleet._step_boats_numpy(numpy_fleet, bearing_errors, 900.)
+    
+    # the single precision winds are promoted at different points of the two implementations, by less than a millimetre
+    assert np.allclose(kernel_fleet.latitude, numpy_fleet.latitude, rtol=0, atol=1e-8)
+    assert np.allclose(kernel_fleet.longitude, numpy_fleet.longitude, rtol=0, atol=1e-8)
+    assert np.allclose(kernel_fleet.distance, numpy_fleet.distance)
+    assert np.allclose(kernel_fleet.bearing, numpy_fleet.bearing)
+    assert np.all(kernel_fleet.trajectory[1, :, 0] == kernel_fleet.latitude)
+    
+    # small fleets are moved by a serial kernel, with the same results
+    serial_fleet = create_test_fleet(latitudes, longitudes, [59, 12])
+    serial_fleet.target_latitude[:] = target_latitudes
+    pytheas.kernels._step_kernel_batch_serial(serial_fleet.latitude, serial_fleet.longitude, serial_fleet.target_latitude, serial_fleet.target_longitude,
+                                              kernel_fleet.local_winds, kernel_fleet.local_currents, bearing_errors, serial_fleet.polar_table, 900.,
+                                              serial_fleet.bearing, serial_fleet.distance, serial_fleet.trajectory[1])
+    assert np.allclose(serial_fleet.latitude, kernel_fleet.latitude, rtol=0, atol=1e-12)
+    assert np.allclose(serial_fleet.longitude, kernel_fleet.longitude, rtol=0, atol=1e-12)
+
+
+def test_fleet_from_boats():
+    test_fleet = create_test_fleet([58], [12], [59, 12])
+    boats = [boat.Boat("Hjortspring", 58, 12, [59, 12], 0.0, test_fleet.speed_polar_diagram, test_fleet.leeway_polar_diagram),
+             boat.Boat("Hjortspring", 57, 11, [59, 12], 5.0, test_fleet.speed_polar_diagram, test_fleet.leeway_polar_diagram)]
+    
+    boats_fleet = fleet.Fleet.from_boats(boats, max_steps=10)
+    assert len(boats_fleet) == 2
+    assert np.all(boats_fleet.latitude == [58, 57]) and np.all(boats_fleet.longitude == [12, 11])
+    assert np.all(boats_fleet.uncertainty_sigma == [0.0, 5.0])
+    
+    # the boat without uncertainty moves exactly as a single Boat does
+    fleet.step_boats(boats_fleet, 15)
+    boats[0].move_boat(np.zeros(2), np.zeros(2), 15)
+    assert abs(boats_fleet.latitude[0] - boats[0].latitude) < 1e-9
+    
+    # boats heading elsewhere, or of the same craft with other polar diagrams, cannot join the fleet, and a fleet needs boats
+    other_target_boat = boat.Boat("Hjortspring", 57, 11, [50, 12], 0.0, test_fleet.speed_polar_diagram, test_fleet.leeway_polar_diagram)
+    other_polar_boat = boat.Boat("Hjortspring", 57, 11, [59, 12], 0.0, test_fleet.speed_polar_diagram * 2, test_fleet.leeway_polar_diagram)
+    for invalid_boats in [boats + [other_target_boat], boats + [other_polar_boat], []]:
+        try:
+            fleet.Fleet.from_boats(invalid_boats, max_steps=10)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_step_boats_noise():
+    # boats with the same random generator seed take the same steps, whether their errors are drawn in advance or not
+    fleets = [create_test_fleet([58, 57], [12, 11], [59, 12]) for _ in range(2)]
+    for test_fleet in fleets:
+        test_fleet.uncertainty_sigma[:] = 10.0
+        test_fleet.rng = np.random.default_rng(7)
+    fleets[0].prime_noise(2)
+    
+    for _ in range(4):
+        for test_fleet in fleets:
+            fleet.step_boats(test_fleet, 15)
+    assert np.all(fleets[0].trajectory[:5] == fleets[1].trajectory[:5])
+    
+    # the errors differ between steps
+    steps = np.diff(fleets[0].trajectory[:5, 0], axis=0)
+    assert not np.allclose(steps[0], steps[1])
+    
+    # a change of uncertainty applies from the next step, even with errors drawn in advance
+    test_fleet = create_test_fleet([58, 58], [12, 12], [59, 12])
+    fleet.step_boats(test_fleet, 15)
+    assert np.all(test_fleet.longitude == 12)
+    test_fleet.uncertainty_sigma[:] = 30.0
+    fleet.step_boats(test_fleet, 15)
+    assert np.all(test_fleet.longitude != 12)
+
+
+def test_step_boats_trajectory_file(tmp_path):
+    # the trajectory can be recorded in a memory-mapped file instead of in memory
+    trajectory_path = str(tmp_path / "trajectory.npy")
+    test_fleet = create_test_fleet([58, 57], [12, 11], [59, 12], max_steps=3)
+    file_fleet = fleet.Fleet(test_fleet.craft, [58, 57], [12, 11], (59, 12), test_fleet.speed_polar_diagram, test_fleet.leeway_polar_diagram,
+                             max_steps=3, trajectory_path=trajectory_path)
+    for _ in range(3):
+        fleet.step_boats(test_fleet, 15)
+        fleet.step_boats(file_fleet, 15)
+    file_fleet.flush_trajectory()
+    test_fleet.flush_trajectory()
+    
+    assert np.all(np.load(trajectory_path, mmap_mode='r') == test_fleet.read_trajectory())
+    assert np.all(file_fleet.read_trajectory() == test_fleet.read_trajectory())
@@ -1 +1,39 @@
-from pytheas import travel
\ No newline at end of file
+import numpy as np
+import pandas as pd
+from pytheas import boat, map, travel
+
+class CalmMap(map.Map):
+    # map with no wind nor current, recording the times at which it is measured
+    def __init__(self):
+        self.times = []
+    
+    def measure_winds(self, location, time):
+        self.times.append(time)
+        return np.zeros(2)
+    
+    def measure_currents(self, location, time):
+        return np.zeros(2)
+
+def test_run():
+    
+    SPEED_POLAR_DIAGRAM_PATH = './configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt'
+    LEEWAY_POLAR_DIAGRAM_PATH = './configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt'
+    speed_polar_diagram = pd.read_csv(SPEED_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv(LEEWAY_POLAR_DIAGRAM_PATH, sep="\t", index_col=0)
+    
+    test_boat = boat.Boat("Hjortspring", 58, 12, [59, 12], speed_polar_diagram=speed_polar_diagram, leeway_polar_diagram=leeway_polar_diagram)
+    calm_map = CalmMap()
+    start_time = pd.Timestamp("2020-01-01")
+    test_travel = travel.Travel(test_boat, calm_map, start_time, 5, 15, [59, 12])
+    
+    # a travel of 5 hours with steps of 15 minutes measures the map every 15 minutes from the start
+    test_travel.run()
+    assert calm_map.times == [start_time + pd.Timedelta(minutes=15 * i) for i in range(20)]
+    assert test_travel.current_time == pd.Timestamp("2020-01-01 05:00")
+    assert len(test_boat.trajectory) == 21
+    
+    # running a finished travel again does nothing
+    test_travel.run()
+    assert len(calm_map.times) == 20
+    assert test_travel.current_time == pd.Timestamp("2020-01-01 05:00")
+    assert len(test_boat.trajectory) == 21
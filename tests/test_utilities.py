@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 from pytheas import utilities
 
 def test_distance_km():
@@ -86,4 +87,69 @@ def test_direction_from_displacement():
     
     displacement = np.array([5, 0])
     bearing = utilities.direction_from_displacement(displacement)
-    assert bearing - 0 < 1e-8
\ No newline at end of file
+    assert bearing - 0 < 1e-8    
+
+def test_bearing_from_latlon_vec():
+    # the vectorised bearings are the same as the ones calculated one by one
+    latitudes = np.array([58, 58, 46])
+    longitudes = np.array([12, 12, 9])
+    target = [59, 13]
+    
+    bearings = utilities.bearing_from_latlon_vec(latitudes, longitudes, target[0], target[1])
+    
+    for latitude, longitude, bearing in zip(latitudes, longitudes, bearings):
+        assert abs(utilities.bearing_from_latlon([latitude, longitude], target) - bearing) < 1e-8
+    
+    # a shared target gives the same bearings as one target per position
+    bearings_per_target = utilities.bearing_from_latlon_vec(latitudes, longitudes, np.full(3, target[0]), np.full(3, target[1]))
+    assert np.allclose(bearings, bearings_per_target, rtol=0, atol=1e-12)
+        
+
+def test_destination_from_latlon_vec():
+    # travelling one degree of arc to the North or to the South only changes the latitude
+    one_degree_km = np.deg2rad(1) * utilities.EARTH_RADIUS_KM
+    latitudes, longitudes = utilities.destination_from_latlon_vec(np.array([58., 58.]), np.array([12., 12.]),
+                                                                  np.array([0., 180.]), np.array([one_degree_km, one_degree_km]))
+    assert np.allclose(latitudes, [59, 57])
+    assert np.allclose(longitudes, [12, 12])
+    
+    # travelling East or West from a point on the equator only changes the longitude, also across the antimeridian
+    latitudes, longitudes = utilities.destination_from_latlon_vec(np.array([0., 0.]), np.array([179.5, -179.5]),
+                                                                  np.array([90., 270.]), np.array([one_degree_km, one_degree_km]))
+    assert np.allclose(latitudes, [0, 0])
+    assert np.allclose(longitudes, [-179.5, 179.5])
+
+
+def test_polar_diagram_to_table():
+    polar_diagram = pd.read_csv('./configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt', sep="\t", index_col=0)
+    table = utilities.polar_diagram_to_table(polar_diagram)
+    assert table.shape == (19, 7)
+    assert table.flags['C_CONTIGUOUS']
+    assert table[9, 2] == polar_diagram['10'][90]
+    
+    # the order of rows and columns in the polar diagram does not matter
+    shuffled_diagram = polar_diagram.iloc[::-1, ::-1]
+    assert np.all(utilities.polar_diagram_to_table(shuffled_diagram) == table)
+    
+    # missing wind speeds are not allowed
+    try:
+        utilities.polar_diagram_to_table(polar_diagram.drop(columns='30'))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_polar_lookup_vec():
+    speed_polar_diagram = pd.read_csv('./configs/hjortspring_speeds_16pad_3000kg_44cad_75oars.txt', sep="\t", index_col=0)
+    leeway_polar_diagram = pd.read_csv('./configs/hjortspring_leeway_16pad_3000kg_44cad_75oars.txt', sep="\t", index_col=0)
+    polar_table = utilities.polar_diagrams_to_table(speed_polar_diagram, leeway_polar_diagram)
+    
+    # the cells of the polar diagrams are read exactly, including the edges and winds above 30 knots
+    speeds, leeways = utilities.polar_lookup_vec(np.array([90.0, 180.0, 0.0]), np.array([10.0, 45.0, 0.0]), polar_table)
+    assert np.allclose(speeds, utilities.knots_to_si(np.array([speed_polar_diagram['10'][90], speed_polar_diagram['30'][180], speed_polar_diagram['0'][0]])))
+    assert np.allclose(leeways, [leeway_polar_diagram['10'][90], leeway_polar_diagram['30'][180], leeway_polar_diagram['0'][0]])
+    
+    # in between, the four surrounding cells are averaged
+    _, leeways = utilities.polar_lookup_vec(np.array([85.0]), np.array([12.5]), polar_table)
+    expected_leeway = (leeway_polar_diagram['10'][80] + leeway_polar_diagram['10'][90] + leeway_polar_diagram['15'][80] + leeway_polar_diagram['15'][90]) / 4
+    assert abs(leeways[0] - expected_leeway) < 1e-10